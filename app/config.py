@@ -27,12 +27,46 @@ UNKNOW_DIR = os.path.join(DATA_ROOT, "unknow")
 LOG_DIR = os.path.join(DATA_ROOT, "logs")
 RECORDS_CSV_PATH = os.path.join(LOG_DIR, "records.csv")
 
+# ========== 运行时性能剖析（face_runtime / hik_mjpeg_server） ==========
+# 向进程发 SIGUSR1 开始/提前结束一次采集；PROFILE_ON_START=1 则启动即采集一次
+PROFILE_DIR = os.path.join(LOG_DIR, "profile")
+PROFILE_ON_START = os.environ.get("PROFILE_ON_START", "0") == "1"
+# 一次采集最多记录多少帧 / 最长多少秒，先到先停
+PROFILE_FRAMES = int(os.environ.get("PROFILE_FRAMES", "500"))
+PROFILE_SECONDS = float(os.environ.get("PROFILE_SECONDS", "60"))
+# 附加剖析：空=只记逐帧 trace；cprofile=触发线程的 cProfile；stack=全线程栈采样
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "")
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.01"))
+
 # ========== 人脸识别相关 ==========
 SEARCH_THRESHOLD = float(os.environ.get("SEARCH_THRESHOLD", "0.48"))
 
 # 视频流来源（给 face_runtime 用），默认还是你现在用的这个地址
 VIDEO_SOURCE = os.environ.get("VIDEO_SOURCE", "http://127.0.0.1:5000/video_feed")
 
+# 取流方式：auto（http 源用内置 MJPEG 读取器，其它用 cv2.VideoCapture）/ mjpeg / opencv
+# 内置读取器能拿到 hik_mjpeg_server 附带的采集时间戳，记录里的时间就是真实采集时间
+VIDEO_READER = os.environ.get("VIDEO_READER", "auto")
+# 帧的最大允许“年龄”（秒，从采集到被读出）；超过的直接丢弃不做识别，0=不限制
+MAX_FRAME_AGE = float(os.environ.get("MAX_FRAME_AGE", "2.0"))
+# 采集→记录延迟统计的打印间隔（秒）
+LATENCY_REPORT_INTERVAL = float(os.environ.get("LATENCY_REPORT_INTERVAL", "60"))
+
+# 推理 worker 数量：1=沿用单线程串行；>1 时把抽样帧分发给 N 个会话并行处理
+INFER_WORKERS = int(os.environ.get("INFER_WORKERS", "1"))
+# worker 类型：thread（InspireFace 走 ctypes，调用期间会释放 GIL）/ process
+INFER_POOL_MODE = os.environ.get("INFER_POOL_MODE", "thread")
+
+# ========== 陌生人在线聚类 ==========
+# 陌生人特征与已有簇中心的余弦相似度 >= 该值时归入同一个簇（unknown-<启动时间>-<n>）
+UNKNOWN_CLUSTER_THRESHOLD = float(os.environ.get("UNKNOWN_CLUSTER_THRESHOLD", str(SEARCH_THRESHOLD)))
+# 内存中最多保留多少个簇，超出后淘汰最久未出现的
+UNKNOWN_CLUSTER_MAX = int(os.environ.get("UNKNOWN_CLUSTER_MAX", "200"))
+# 同一个簇两次写日志的最小间隔（秒）；新簇总会立即记录
+UNKNOWN_LOG_INTERVAL = float(os.environ.get("UNKNOWN_LOG_INTERVAL", "60"))
+# 是否为每个新簇保存一张代表性人脸截图到 UNKNOW_DIR
+SAVE_UNKNOWN_CROPS = os.environ.get("SAVE_UNKNOWN_CROPS", "1") == "1"
+
 # ========== 海康摄像头 & MJPEG HTTP ==========
 HIK_IP = os.environ.get("HIK_IP", "192.168.1.111")
 HIK_USER = os.environ.get("HIK_USER", "admin")
@@ -43,5 +77,9 @@ HIK_PORT = int(os.environ.get("HIK_PORT", "554"))
 HIK_CHANNEL_MAIN = os.environ.get("HIK_CHANNEL_MAIN", "Streaming/Channels/101")
 HIK_CHANNEL_SUB = os.environ.get("HIK_CHANNEL_SUB", "Streaming/Channels/102")
 
+# 直接指定取流地址（设置后不再按 HIK_* 拼 RTSP 候选），比如指向 fake_camera：
+# HIK_STREAM_URL=http://127.0.0.1:8554/stream
+HIK_STREAM_URL = os.environ.get("HIK_STREAM_URL", "")
+
 HTTP_HOST = os.environ.get("HTTP_HOST", "0.0.0.0")
 HTTP_PORT = int(os.environ.get("HTTP_PORT", "5000"))
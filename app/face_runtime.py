@@ -5,6 +5,7 @@ import os
 import time
 import json
 import csv
+import threading
 from datetime import datetime
 
 import cv2
@@ -12,18 +13,34 @@ import inspireface as isf
 
 # ================== 路径 & 配置（统一走 app.config） ==================
 from app.config import (
+    DATA_ROOT,
     FEATURE_DB_DIR,
     FEATURE_DB_PATH,
     LABEL_MAP_PATH,
     LOG_DIR,
     RECORDS_CSV_PATH,
+    UNKNOW_DIR,
     SEARCH_THRESHOLD,
     VIDEO_SOURCE,
+    VIDEO_READER,
+    MAX_FRAME_AGE,
+    LATENCY_REPORT_INTERVAL,
+    INFER_WORKERS,
+    INFER_POOL_MODE,
+    UNKNOWN_CLUSTER_THRESHOLD,
+    UNKNOWN_CLUSTER_MAX,
+    UNKNOWN_LOG_INTERVAL,
+    SAVE_UNKNOWN_CROPS,
 )
+from app.infer_pool import InferencePool
+from app.mjpeg_reader import MjpegReader
+from app.profiling import FrameTracer, ms
+from app.unknown_cluster import UnknownClusterIndex
 
 # 确保目录存在
 os.makedirs(FEATURE_DB_DIR, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
+os.makedirs(UNKNOW_DIR, exist_ok=True)
 
 # 是否显示调试窗口
 SHOW_WINDOW = False
@@ -40,6 +57,37 @@ ENABLE_CSV_LOG = True
 # 全局：face_id -> label
 KNOWN_LABEL_MAP = {}
 
+# FeatureHub 是进程内全局的，多线程 worker 搜索时串行化（搜索远比特征提取便宜）
+_hub_search_lock = threading.Lock()
+
+# 推理 worker 自己的会话（线程模式下每个线程一份）
+_worker_local = threading.local()
+
+# 陌生人在线聚类（只在主线程按帧序使用）
+UNKNOWN_CLUSTERS = UnknownClusterIndex(UNKNOWN_CLUSTER_THRESHOLD, UNKNOWN_CLUSTER_MAX)
+
+# 逐帧 trace / 性能剖析（平时关闭，kill -USR1 触发）
+# 推理池里的检测/识别不在主循环线程：线程模式可用 stack 采样看到，进程模式两种 dump 都看不到，
+# 只能看 trace 里 worker 回传的 detect_ms / extract_ms / search_ms
+_WORKER_PROFILE_WARNING = None
+if INFER_WORKERS > 1 and INFER_POOL_MODE == "thread":
+    _WORKER_PROFILE_WARNING = "检测/识别跑在推理池线程里，.prof 里看不到，请改用 PROFILE_MODE=stack"
+elif INFER_WORKERS > 1:
+    _WORKER_PROFILE_WARNING = (
+        "INFER_POOL_MODE=process 时检测/识别跑在子进程里，.prof 和 .stacks.txt 都看不到，"
+        "只能参考 trace 里的 detect_ms / extract_ms / search_ms"
+    )
+
+TRACER = FrameTracer(
+    "face_runtime",
+    cprofile_warning=_WORKER_PROFILE_WARNING,
+    stack_warning=_WORKER_PROFILE_WARNING if INFER_POOL_MODE == "process" else None,
+)
+
+# 采集→记录（glass-to-log）延迟统计，每 LATENCY_REPORT_INTERVAL 秒打印一次并清零
+# stale_skipped 是进程启动以来读取器丢弃的过期帧总数（跨重连累计，不随汇总清零）
+LATENCY_STATS = {"count": 0, "sum": 0.0, "max": 0.0, "since": time.time(), "stale_skipped": 0}
+
 
 # ================== label_map 工具函数 ==================
 
@@ -60,9 +108,19 @@ def load_label_map():
 
 # ================== InspireFace 初始化（只加载已有特征） ==================
 
-def init_inspireface():
+def create_session():
+    """创建一个检测 + 识别会话；会话本身不是线程安全的，每个 worker 各持一个"""
+    session = isf.InspireFaceSession(
+        isf.HF_ENABLE_FACE_RECOGNITION,
+        isf.HF_DETECT_MODE_ALWAYS_DETECT,
+    )
+    session.set_detection_confidence_threshold(0.5)
+    return session
+
+
+def init_feature_hub():
     """
-    初始化 InspireFace 会话 + FeatureHub。
+    全局初始化：加载模型包 + 启用 FeatureHub + 读取 label_map，每个进程只需一次。
     不再从 know 目录建库，只使用已有数据库和 label_map。
     """
     try:
@@ -70,15 +128,6 @@ def init_inspireface():
     except Exception as e:
         print("[WARN] reload Pikachu 失败：", e)
 
-    opt = isf.HF_ENABLE_FACE_RECOGNITION
-
-    session = isf.InspireFaceSession(
-        opt,
-        isf.HF_DETECT_MODE_ALWAYS_DETECT,
-    )
-
-    session.set_detection_confidence_threshold(0.5)
-
     feature_hub_cfg = isf.FeatureHubConfiguration(
         primary_key_mode=isf.HF_PK_AUTO_INCREMENT,
         enable_persistence=True,
@@ -94,17 +143,21 @@ def init_inspireface():
 
     load_label_map()
 
-    return session
+
+def init_inspireface():
+    """初始化 FeatureHub 并创建一个会话（单线程 / 进程池 worker 用）"""
+    init_feature_hub()
+    return create_session()
 
 
 # ================== 工具函数 ==================
 
-def crop_face_from_frame(frame, face):
+def crop_face_from_frame(frame, location):
     """
-    根据 InspireFace 的 face.location 从整帧中截取人脸子图
+    根据人脸框 location（即 face.location）从整帧中截取人脸子图
     """
     h, w = frame.shape[:2]
-    x1, y1, x2, y2 = map(int, face.location)
+    x1, y1, x2, y2 = map(int, location)
 
     x1 = max(0, min(x1, w - 1))
     y1 = max(0, min(y1, h - 1))
@@ -117,24 +170,32 @@ def crop_face_from_frame(frame, face):
     return frame[y1:y2, x1:x2]
 
 
-def recognize_face(session, frame, face):
+def recognize_face(session, frame, face, timings=None):
     """
     对单张人脸进行识别：
     1. 用整帧 + face 做特征提取
     2. 用 FeatureHub 搜索最近的一个 ID
-    3. 返回 (是否匹配, 置信度, identity_id, label)
+    3. 返回 (是否匹配, 置信度, identity_id, label, feature)
+    传入 timings 时把提取 / 搜索耗时（秒）累加到 timings["extract"] / timings["search"]。
     """
+    t0 = time.perf_counter()
     feature = session.face_feature_extract(frame, face)
+    t1 = time.perf_counter()
+    if timings is not None:
+        timings["extract"] += t1 - t0
     if feature is None or feature.size == 0:
-        return False, 0.0, -1, None
+        return False, 0.0, -1, None, None
 
-    result = isf.feature_hub_face_search(feature)
+    with _hub_search_lock:
+        result = isf.feature_hub_face_search(feature)
+    if timings is not None:
+        timings["search"] += time.perf_counter() - t1
     if result is None:
-        return False, 0.0, -1, None
+        return False, 0.0, -1, None, feature
 
     # 关键：从 similar_identity.id 拿 ID
     if result.similar_identity is None or result.similar_identity.id == -1:
-        return False, float(result.confidence), -1, None
+        return False, float(result.confidence), -1, None, feature
 
     confidence = float(result.confidence)
     identity_id = int(result.similar_identity.id)
@@ -142,14 +203,61 @@ def recognize_face(session, frame, face):
     is_match = confidence >= SEARCH_THRESHOLD
     label = KNOWN_LABEL_MAP.get(str(identity_id))
 
-    return is_match, confidence, identity_id, label
+    return is_match, confidence, identity_id, label, feature
+
+
+def process_frame(session, frame):
+    """
+    对一帧做检测 + 逐个识别，返回可跨进程传递的 (results, timings)：
+    results = [{"location": (x1, y1, x2, y2), "is_match", "confidence", "identity_id", "label", "feature"}, ...]
+    feature 只给未匹配的人脸保留（用于陌生人聚类），已匹配的为 None。
+    timings = {"detect", "extract", "search"}（秒），几次 perf_counter 而已，始终统计，供 trace 使用。
+    """
+    results = []
+    timings = {"detect": 0.0, "extract": 0.0, "search": 0.0}
+
+    t0 = time.perf_counter()
+    faces = session.face_detection(frame)
+    timings["detect"] = time.perf_counter() - t0
+
+    for face in faces or []:
+        is_match, conf, identity_id, label, feature = recognize_face(session, frame, face, timings)
+        results.append({
+            "location": tuple(map(int, face.location)),
+            "is_match": is_match,
+            "confidence": conf,
+            "identity_id": identity_id,
+            "label": label,
+            "feature": None if is_match else feature,
+        })
+    return results, timings
+
+
+# ================== 并行推理 worker ==================
+
+def pool_worker_init(mode):
+    """
+    推理池 worker 初始化：
+    - 线程模式：FeatureHub / label_map 已由主线程加载，只需新建会话
+    - 进程模式：spawn 出来的新进程什么都没有，完整初始化一遍
+    """
+    if mode == "process":
+        _worker_local.session = init_inspireface()
+    else:
+        _worker_local.session = create_session()
+
+
+def pool_worker_run(frame):
+    return process_frame(_worker_local.session, frame)
 
 
 # ================== 记录到 CSV ==================
 
-def log_to_csv(timestamp, label, confidence, status):
+def log_to_csv(timestamp, label, confidence, status, image_path="", message=""):
     """
-    写入 CSV（不再落盘图片，因此 image_path 为空）。
+    写入 CSV。已知人脸不落盘图片，image_path 为空；
+    陌生人簇的 image_path 是代表性截图（相对 DATA_ROOT，供看板 /image 访问）。
+    message 列目前记录采集→记录延迟（latency_ms=...），没有采集时间戳时为空。
     """
     if not ENABLE_CSV_LOG:
         return
@@ -158,19 +266,217 @@ def log_to_csv(timestamp, label, confidence, status):
         writer = csv.writer(f)
         writer.writerow([
             timestamp,
-            "",  # image_path 留空
+            image_path,
             label or "",
             f"{confidence:.6f}",
             f"{SEARCH_THRESHOLD:.6f}",
             status,
-            "",
+            message,
         ])
 
 
+# ================== 陌生人聚类 ==================
+
+def save_unknown_crop(frame, location, cluster):
+    """
+    为新簇保存一张代表性截图到 UNKNOW_DIR，返回相对 DATA_ROOT 的路径（失败返回空串）
+    """
+    crop = crop_face_from_frame(frame, location)
+    if crop is None:
+        return ""
+
+    fname = f"{cluster.label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+    path = os.path.join(UNKNOW_DIR, fname)
+    if not cv2.imwrite(path, crop):
+        print("[WARN] 保存陌生人截图失败：", path)
+        return ""
+
+    return os.path.relpath(path, DATA_ROOT)
+
+
+def resolve_unknown(frame, r):
+    """
+    把一个未匹配的人脸归入陌生人簇，返回 (伪标签, 是否需要记录, 截图路径)。
+    新簇立即记录（可选保存截图），老簇每 UNKNOWN_LOG_INTERVAL 秒最多记录一次。
+    """
+    if r["feature"] is None:
+        return None, True, ""
+
+    cluster, is_new = UNKNOWN_CLUSTERS.assign(r["feature"])
+    if is_new and SAVE_UNKNOWN_CROPS:
+        cluster.image_path = save_unknown_crop(frame, r["location"], cluster)
+
+    should_log = UNKNOWN_CLUSTERS.should_log(cluster, UNKNOWN_LOG_INTERVAL)
+    return cluster.label, should_log, cluster.image_path
+
+
+# ================== 延迟统计 ==================
+
+def record_latency(latency):
+    """累计一帧的采集→记录延迟（秒），到时间就打印汇总"""
+    LATENCY_STATS["count"] += 1
+    LATENCY_STATS["sum"] += latency
+    LATENCY_STATS["max"] = max(LATENCY_STATS["max"], latency)
+
+    now = time.time()
+    if now - LATENCY_STATS["since"] < LATENCY_REPORT_INTERVAL:
+        return
+
+    count = LATENCY_STATS["count"]
+    print(
+        f"[INFO] 采集→记录延迟：frames={count}, "
+        f"avg={LATENCY_STATS['sum'] / count * 1000:.0f}ms, "
+        f"max={LATENCY_STATS['max'] * 1000:.0f}ms, "
+        f"累计丢弃过期帧={LATENCY_STATS['stale_skipped']}"
+    )
+    LATENCY_STATS.update(count=0, sum=0.0, max=0.0, since=now)
+
+
+# ================== 结果输出 ==================
+
+def report_results(frame, results, meta):
+    """
+    输出一帧的识别结果：打印 + 写 CSV + （可选）画框。
+    并行模式下由主线程按帧序调用，保证日志顺序与画面顺序一致。
+    meta["capture_ts"] 不为空时，记录时间用真实采集时间，并统计采集→记录延迟。
+    """
+    capture_ts = meta["capture_ts"]
+    if capture_ts is not None:
+        ts = datetime.fromtimestamp(capture_ts).strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # 先记录（陌生人截图要在画框之前截取），再统一画框
+    for r in results:
+        is_match = r["is_match"]
+        conf = r["confidence"]
+        identity_id = r["identity_id"]
+
+        if is_match:
+            status = "MATCH"
+            label = r["label"]
+            image_path = ""
+            name_part = label if label else f"id={identity_id}"
+            print(f"[{ts}] MATCH {name_part} id={identity_id} conf={conf:.3f}")
+        else:
+            status = "UNKNOWN"
+            label, should_log, image_path = resolve_unknown(frame, r)
+            r["label"] = label
+            if not should_log:
+                continue
+            name_part = label if label else f"id={identity_id}"
+            print(f"[{ts}] UNKNOWN {name_part} conf={conf:.3f}")
+
+        message = ""
+        if capture_ts is not None:
+            message = f"latency_ms={(time.time() - capture_ts) * 1000:.0f}"
+
+        # 写入 CSV 日志
+        log_to_csv(
+            timestamp=ts,
+            label=label,
+            confidence=conf,
+            status=status,
+            image_path=image_path,
+            message=message,
+        )
+
+    if capture_ts is not None:
+        record_latency(time.time() - capture_ts)
+
+    # 画框显示（可选）
+    if SHOW_WINDOW:
+        for r in results:
+            conf = r["confidence"]
+            identity_id = r["identity_id"]
+            label = r["label"]
+            x1, y1, x2, y2 = r["location"]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            txt = label if label else f"id={identity_id}"
+            label_txt = f"{txt} {conf:.2f}"
+            cv2.putText(
+                frame,
+                label_txt,
+                (x1, max(0, y1 - 5)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                (255, 255, 255),
+                1
+            )
+
+
+def show_frame(frame):
+    """显示调试窗口，按 q 返回 True 表示要退出"""
+    if not SHOW_WINDOW:
+        return False
+    cv2.imshow("Face Runtime", frame)
+    return (cv2.waitKey(1) & 0xFF) == ord('q')
+
+
+def trace_frame(frame_idx, meta, results, timings, log_seconds):
+    """把一帧的各阶段耗时写入 trace（未开启时直接返回）"""
+    if not TRACER.active:
+        return
+    TRACER.record(
+        "frame",
+        frame_idx=frame_idx,
+        seq=meta["seq"],
+        faces=len(results),
+        read_ms=ms(meta["read"]),
+        detect_ms=ms(timings.get("detect", 0.0)),
+        extract_ms=ms(timings.get("extract", 0.0)),
+        search_ms=ms(timings.get("search", 0.0)),
+        log_ms=ms(log_seconds),
+        age_ms=ms(time.time() - meta["capture_ts"]) if meta["capture_ts"] is not None else None,
+    )
+
+
+def handle_results(frame_idx, frame, meta, out):
+    """输出一帧的 process_frame 结果并记 trace；out 为 None 表示推理失败"""
+    results, timings = out if out is not None else ([], {})
+
+    t0 = time.perf_counter()
+    report_results(frame, results, meta)
+    trace_frame(frame_idx, meta, results, timings, time.perf_counter() - t0)
+
+
+def report_ready(ready):
+    """按帧序输出推理池返回的结果，返回是否要退出"""
+    quit_requested = False
+    for frame_idx, frame, meta, out in ready:
+        handle_results(frame_idx, frame, meta, out)
+        quit_requested = show_frame(frame) or quit_requested
+    return quit_requested
+
+
+def open_video_source():
+    """
+    按 VIDEO_READER 打开视频源：http(s) 源默认走内置 MjpegReader（带采集时间戳），
+    其它（rtsp / 本地文件 / 强制 opencv）走 cv2.VideoCapture。
+    """
+    use_mjpeg = VIDEO_READER == "mjpeg" or (
+        VIDEO_READER == "auto" and VIDEO_SOURCE.startswith(("http://", "https://"))
+    )
+    if use_mjpeg:
+        return MjpegReader(VIDEO_SOURCE, max_age=MAX_FRAME_AGE)
+    return cv2.VideoCapture(VIDEO_SOURCE)
+
+
 # ================== 主循环：拉流 + 识别（带自动重连） ==================
 
 def main():
-    session = init_inspireface()
+    TRACER.install_signal_handler()
+
+    pool = None
+    session = None
+
+    if INFER_WORKERS > 1:
+        # 线程模式共享本进程的 FeatureHub，主线程先初始化；进程模式由各 worker 自行初始化
+        if INFER_POOL_MODE == "thread":
+            init_feature_hub()
+        pool = InferencePool(INFER_WORKERS, INFER_POOL_MODE, pool_worker_init, pool_worker_run)
+    else:
+        session = init_inspireface()
 
     cap = None
     fail_count = 0
@@ -181,29 +487,46 @@ def main():
             # 如果还没有 cap，或者 cap 被释放了 / 打不开，就尝试重新连接
             if cap is None or not cap.isOpened():
                 print("[INFO] 尝试连接视频源：", VIDEO_SOURCE)
-                cap = cv2.VideoCapture(VIDEO_SOURCE)
+                cap = open_video_source()
 
                 if not cap.isOpened():
                     print("[ERROR] 无法打开视频源，2 秒后重试...")
                     if cap is not None:
                         cap.release()
                     cap = None
+                    # 断流期间也要把已识别完的帧记下来，不能等流恢复
+                    if pool is not None and report_ready(pool.poll()):
+                        break
                     time.sleep(2)
                     continue
 
                 print("[INFO] 视频源连接成功。")
                 fail_count = 0
 
+            TRACER.poll()
+
             # 读取一帧
+            t_read = time.perf_counter()
             ret, frame = cap.read()
+            read_seconds = time.perf_counter() - t_read
+
+            # 读取器的过期丢帧计数收进全局累计（读失败前也可能丢过帧），读完清零避免重复计入
+            if isinstance(cap, MjpegReader):
+                LATENCY_STATS["stale_skipped"] += cap.stale_skipped
+                cap.stale_skipped = 0
+
             if not ret or frame is None:
                 fail_count += 1
                 print(f"[WARN] 读取帧失败（{fail_count}/{MAX_FRAME_FAILS}），0.1 秒后重试...")
+                if pool is not None and report_ready(pool.poll()):
+                    break
                 time.sleep(0.1)
 
                 # 连续多次失败：断开并重连
                 if fail_count >= MAX_FRAME_FAILS:
                     print("[INFO] 连续读取帧失败次数过多，重置视频连接...")
+                    if pool is not None and report_ready(pool.drain()):
+                        break
                     cap.release()
                     cap = None
                     fail_count = 0
@@ -212,63 +535,42 @@ def main():
             # 一旦成功读到帧，失败计数清零
             fail_count = 0
 
+            # 内置读取器带采集时间戳 / 帧序号；过期帧已在读取时丢弃
+            meta = {"capture_ts": None, "seq": None, "read": read_seconds}
+            if isinstance(cap, MjpegReader):
+                meta.update(cap.last_meta)
+
             frame_idx += 1
 
             # 降频：只在指定帧上做检测/识别
             if DETECT_EVERY_N_FRAMES > 1 and (frame_idx % DETECT_EVERY_N_FRAMES != 0):
-                if SHOW_WINDOW:
-                    cv2.imshow("Face Runtime", frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
+                # 顺便把已经算完的帧按序输出，避免结果在池里滞留
+                if pool is not None and report_ready(pool.poll()):
+                    break
+                if pool is None and show_frame(frame):
+                    break
                 continue
 
-            # 检测人脸
-            faces = session.face_detection(frame)
-            if not faces:
-                if SHOW_WINDOW:
-                    cv2.imshow("Face Runtime", frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
+            if pool is not None:
+                # 并行：提交后立刻返回，结果按帧序陆续取回
+                ready = pool.submit(frame_idx, frame, meta)
+                ready.extend(pool.poll())
+                if report_ready(ready):
+                    break
                 continue
 
-            # 逐个识别
-            for face in faces:
-                is_match, conf, identity_id, label = recognize_face(session, frame, face)
-
-                ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                if is_match:
-                    status = "MATCH"
-                    name_part = label if label else f"id={identity_id}"
-                    print(f"[{ts}] MATCH {name_part} id={identity_id} conf={conf:.3f}")
-                else:
-                    status = "UNKNOWN"
-                    print(f"[{ts}] UNKNOWN id={identity_id} conf={conf:.3f}")
-
-                # 写入 CSV 日志
-                log_to_csv(timestamp=ts, label=label, confidence=conf, status=status)
-
-                # 画框显示（可选）
-                if SHOW_WINDOW:
-                    x1, y1, x2, y2 = map(int, face.location)
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    txt = label if label else f"id={identity_id}"
-                    label_txt = f"{txt} {conf:.2f}"
-                    cv2.putText(
-                        frame,
-                        label_txt,
-                        (x1, max(0, y1 - 5)),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (255, 255, 255),
-                        1
-                    )
-
-            if SHOW_WINDOW:
-                cv2.imshow("Face Runtime", frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+            # 串行：检测 + 识别 + 输出
+            handle_results(frame_idx, frame, meta, process_frame(session, frame))
+
+            if show_frame(frame):
+                break
 
     finally:
+        if pool is not None:
+            # 把在途帧的结果也记下来再退出
+            report_ready(pool.drain())
+            pool.close()
+        TRACER.stop("程序退出")
         if cap is not None:
             cap.release()
         if SHOW_WINDOW:
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟摄像头：把循环播放的视频文件 / 图片目录（或自动生成的测试画面）
+以 MJPEG over HTTP 的形式按指定分辨率和帧率输出，用来在没有海康摄像头的机器上压测整条链路。
+
+    python -m app.fake_camera --source demo.mp4 --fps 25 --width 1280 --height 720
+    HIK_STREAM_URL=http://127.0.0.1:8554/stream python -m app.hik_mjpeg_server
+
+可注入故障：
+- --stall-every / --stall-duration：每隔 N 秒停止出帧 M 秒（连接保持，模拟卡顿）
+- --disconnect-every：每个客户端连接 N 秒后被主动断开（模拟掉线，考验重连）
+"""
+
+import os
+import time
+import argparse
+import threading
+
+import cv2
+import numpy as np
+from flask import Flask, Response
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+latest_jpeg = None
+latest_capture_ts = 0.0
+latest_seq = 0
+# 新帧到达时唤醒所有客户端，编码只做一次，所有客户端共享同一份 JPEG
+frame_cond = threading.Condition()
+stop_flag = False
+
+app = Flask(__name__)
+args = None
+
+
+# ================== 帧来源 ==================
+
+def iter_video(path):
+    """循环读取视频文件"""
+    while not stop_flag:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise RuntimeError(f"无法打开视频文件：{path}")
+        count = 0
+        while not stop_flag:
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                break
+            count += 1
+            yield frame
+        cap.release()
+        # 能打开但一帧都读不出来，继续循环只会空转
+        if count == 0 and not stop_flag:
+            raise RuntimeError(f"视频文件里读不出任何帧：{path}")
+
+
+def iter_image_dir(path):
+    """循环读取目录下的图片（按文件名排序），启动时全部读入内存"""
+    files = sorted(
+        os.path.join(path, f) for f in os.listdir(path)
+        if f.lower().endswith(IMAGE_EXTS)
+    )
+    images = [img for img in (cv2.imread(f) for f in files) if img is not None]
+    if not images:
+        raise RuntimeError(f"目录里没有可用图片：{path}")
+    print(f"[INFO] 已加载 {len(images)} 张图片：{path}")
+    while not stop_flag:
+        for img in images:
+            yield img
+
+
+def iter_synthetic(width, height):
+    """没有素材时自动生成测试画面：移动的色块 + 帧号 + 时间"""
+    idx = 0
+    while not stop_flag:
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        x = (idx * 8) % max(1, width - 100)
+        cv2.rectangle(frame, (x, height // 3), (x + 100, height // 3 + 100), (0, 200, 255), -1)
+        cv2.putText(
+            frame,
+            f"fake-camera #{idx} {time.strftime('%H:%M:%S')}",
+            (20, 40),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1.0,
+            (255, 255, 255),
+            2
+        )
+        idx += 1
+        yield frame
+
+
+def open_source():
+    if not args.source:
+        return iter_synthetic(args.width, args.height)
+    if os.path.isdir(args.source):
+        return iter_image_dir(args.source)
+    return iter_video(args.source)
+
+
+# ================== 出帧线程 ==================
+
+def producer_thread_func():
+    """按 --fps 节奏出帧：缩放到目标分辨率 → 编码 JPEG → 唤醒所有客户端"""
+    global latest_jpeg, latest_capture_ts, latest_seq, stop_flag
+
+    try:
+        interval = 1.0 / args.fps
+        start = time.time()
+        next_stall = start + args.stall_every if args.stall_every > 0 else None
+        next_tick = start
+
+        for frame in open_source():
+            if stop_flag:
+                break
+
+            now = time.time()
+            if next_stall is not None and now >= next_stall:
+                print(f"[INFO] 注入卡顿：{args.stall_duration} 秒不出帧")
+                time.sleep(args.stall_duration)
+                now = time.time()
+                next_stall = now + args.stall_every
+                next_tick = now
+
+            if frame.shape[1] != args.width or frame.shape[0] != args.height:
+                frame = cv2.resize(frame, (args.width, args.height))
+
+            ret, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+            if not ret:
+                print("[WARN] JPEG 编码失败")
+                continue
+
+            with frame_cond:
+                latest_jpeg = jpeg.tobytes()
+                latest_capture_ts = now
+                latest_seq += 1
+                frame_cond.notify_all()
+
+            # 按绝对时间排节奏，编码耗时不会累积成漂移；落后太多就直接追上
+            next_tick += interval
+            delay = next_tick - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.time()
+    except Exception as e:
+        # 出帧线程挂了，Flask 只会继续返回空流；直接结束进程，让压测明确失败而不是报 0 FPS
+        print("[ERROR] 出帧线程异常退出，程序终止：", e)
+        stop_flag = True
+        os._exit(1)
+
+    print("[INFO] 出帧线程已退出")
+
+
+# ================== Flask 路由 ==================
+
+def mjpeg_generator():
+    """每个客户端一个生成器：等新帧 → 输出一个 multipart part；到时间就主动断开"""
+    print("[INFO] 新的模拟摄像头客户端连接")
+    connected_at = time.time()
+    last_seq = 0
+
+    while not stop_flag:
+        if args.disconnect_every > 0 and time.time() - connected_at >= args.disconnect_every:
+            print("[INFO] 注入掉线：主动断开客户端")
+            return
+
+        with frame_cond:
+            frame_cond.wait_for(lambda: latest_seq != last_seq or stop_flag, timeout=1.0)
+            if latest_seq == last_seq:
+                continue
+            jpg_bytes, capture_ts, last_seq = latest_jpeg, latest_capture_ts, latest_seq
+
+        yield (
+            b"--frame\r\n"
+            b"Content-Type: image/jpeg\r\n" +
+            f"Content-Length: {len(jpg_bytes)}\r\n"
+            f"X-Capture-Timestamp: {capture_ts:.6f}\r\n"
+            f"X-Frame-Seq: {last_seq}\r\n\r\n".encode("ascii") +
+            jpg_bytes +
+            b"\r\n"
+        )
+
+
+@app.route("/stream")
+def stream():
+    return Response(
+        mjpeg_generator(),
+        mimetype="multipart/x-mixed-replace; boundary=frame"
+    )
+
+
+@app.route("/snapshot")
+def snapshot():
+    with frame_cond:
+        jpg_bytes = latest_jpeg
+    if jpg_bytes is None:
+        return "no frame yet", 503
+    return Response(jpg_bytes, mimetype="image/jpeg")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="本地模拟摄像头（MJPEG over HTTP）")
+    parser.add_argument("--source", default="", help="视频文件或图片目录；留空则生成测试画面")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8554)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--quality", type=int, default=80, help="JPEG 质量 1~100")
+    parser.add_argument("--stall-every", type=float, default=0.0, help="每隔多少秒卡顿一次，0=不卡顿")
+    parser.add_argument("--stall-duration", type=float, default=3.0, help="每次卡顿多少秒")
+    parser.add_argument("--disconnect-every", type=float, default=0.0, help="客户端连上多少秒后断开，0=不断开")
+    args = parser.parse_args()
+
+    if args.fps <= 0:
+        parser.error("--fps 必须大于 0")
+    if args.width <= 0 or args.height <= 0:
+        parser.error("--width / --height 必须大于 0")
+    if not 1 <= args.quality <= 100:
+        parser.error("--quality 必须在 1~100 之间")
+    return args
+
+
+def main():
+    global args, stop_flag
+
+    args = parse_args()
+
+    t = threading.Thread(target=producer_thread_func, daemon=True)
+    t.start()
+
+    print(f"[INFO] 模拟摄像头：{args.source or '测试画面'} {args.width}x{args.height}@{args.fps}fps")
+    print(f"[INFO] MJPEG 流地址: http://{args.host}:{args.port}/stream")
+
+    try:
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+    finally:
+        stop_flag = True
+        with frame_cond:
+            frame_cond.notify_all()
+        t.join(timeout=2)
+        print("[INFO] 程序退出")
+
+
+if __name__ == "__main__":
+    main()
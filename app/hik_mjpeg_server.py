@@ -10,9 +10,11 @@ from app.config import (
     HIK_PORT,
     HIK_CHANNEL_MAIN,
     HIK_CHANNEL_SUB,
+    HIK_STREAM_URL,
     HTTP_HOST,
     HTTP_PORT,
 )
+from app.profiling import FrameTracer, ms
 
 # 海康常见 RTSP URL 候选列表（基于 config）
 CANDIDATE_URLS = [
@@ -24,11 +26,25 @@ CANDIDATE_URLS = [
     f"rtsp://{HIK_USER}:{HIK_PWD}@{HIK_IP}:{HIK_PORT}/{HIK_CHANNEL_SUB}?transportmode=unicast",
 ]
 
+# 指定了 HIK_STREAM_URL（如本地 fake_camera）就只用它
+if HIK_STREAM_URL:
+    CANDIDATE_URLS = [HIK_STREAM_URL]
+
 
 latest_frame = None
-frame_lock = threading.Lock()
+# latest_frame 的采集时间（time.time()，读帧返回的那一刻）和单调递增的帧序号
+latest_capture_ts = 0.0
+latest_seq = 0
+# 新帧到达时唤醒所有等待的 MJPEG 客户端（同时充当 latest_* 的锁）
+frame_cond = threading.Condition()
 stop_flag = False
 
+# 逐帧 trace / 性能剖析（平时关闭，kill -USR1 触发；由采集线程 poll）
+TRACER = FrameTracer(
+    "hik_mjpeg_server",
+    cprofile_warning="只剖析采集线程，各客户端的 JPEG 编码在 Flask 请求线程里，.prof 里看不到，请改用 PROFILE_MODE=stack",
+)
+
 app = Flask(__name__)
 
 
@@ -62,7 +78,7 @@ def try_open_stream(url, test_frames=30, timeout_sec=5):
 
 def capture_thread_func():
     """后台线程：持续从摄像头读取帧，更新 latest_frame"""
-    global latest_frame, stop_flag
+    global latest_frame, latest_capture_ts, latest_seq, stop_flag
 
     working_cap = None
 
@@ -80,34 +96,70 @@ def capture_thread_func():
         return
 
     while not stop_flag:
+        TRACER.poll()
+
+        t_read = time.perf_counter()
         ret, frame = working_cap.read()
+        capture_ts = time.time()
+        read_seconds = time.perf_counter() - t_read
         if not ret or frame is None:
             print("[WARN] 读取帧失败，等待 0.5 秒后重试...")
             time.sleep(0.5)
             continue
 
-        with frame_lock:
+        with frame_cond:
             latest_frame = frame
+            latest_capture_ts = capture_ts
+            latest_seq += 1
+            seq = latest_seq
+            frame_cond.notify_all()
+
+        if TRACER.active:
+            TRACER.record("capture", seq=seq, read_ms=ms(read_seconds))
 
     working_cap.release()
+    TRACER.stop("采集线程退出")
     print("[INFO] 采集线程已退出")
 
 
+def get_latest_frame(last_seq=None, timeout=1.0):
+    """
+    取最新帧的副本，返回 (frame, capture_ts, seq)；还没有帧时 frame 为 None。
+    传入 last_seq 时先等到有比它新的帧（最多 timeout 秒），没等到同样返回 None，不做拷贝。
+    """
+    with frame_cond:
+        if last_seq is not None:
+            frame_cond.wait_for(lambda: latest_seq != last_seq or stop_flag, timeout=timeout)
+            if latest_seq == last_seq:
+                return None, 0.0, last_seq
+        if latest_frame is None:
+            return None, 0.0, 0
+        return latest_frame.copy(), latest_capture_ts, latest_seq
+
+
+def frame_headers(capture_ts, seq):
+    """每帧附带的采集时间戳 / 帧序号头，face_runtime 的 MjpegReader 依赖这两个头"""
+    return {
+        "X-Capture-Timestamp": f"{capture_ts:.6f}",
+        "X-Frame-Seq": str(seq),
+    }
+
+
 def mjpeg_generator():
     """Flask 使用的生成器，将 latest_frame 编码为 JPEG，并以 MJPEG 形式输出"""
-    global latest_frame, stop_flag
+    global stop_flag
 
     print("[INFO] 新的 MJPEG 客户端连接")
+    last_seq = 0
     while not stop_flag:
-        with frame_lock:
-            frame = None if latest_frame is None else latest_frame.copy()
-
+        # 阻塞等新帧（同一帧不重复拷贝 / 编码 / 发送）
+        frame, capture_ts, seq = get_latest_frame(last_seq)
         if frame is None:
-            # 还没拿到任何帧，稍微等一下
-            time.sleep(0.05)
             continue
+        last_seq = seq
 
         # 编码为 JPEG
+        t_encode = time.perf_counter()
         ret, jpeg = cv2.imencode(".jpg", frame)
         if not ret:
             print("[WARN] JPEG 编码失败")
@@ -115,10 +167,26 @@ def mjpeg_generator():
 
         jpg_bytes = jpeg.tobytes()
 
+        if TRACER.active:
+            TRACER.record(
+                "encode",
+                seq=seq,
+                client=threading.get_ident(),
+                encode_ms=ms(time.perf_counter() - t_encode),
+                bytes=len(jpg_bytes),
+                age_ms=ms(time.time() - capture_ts),
+            )
+
+        headers = frame_headers(capture_ts, seq)
+        headers["Content-Length"] = str(len(jpg_bytes))
+        header_bytes = "".join(f"{k}: {v}\r\n" for k, v in headers.items()).encode("ascii")
+
         # multipart/x-mixed-replace 的一帧
         yield (
             b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" +
+            b"Content-Type: image/jpeg\r\n" +
+            header_bytes +
+            b"\r\n" +
             jpg_bytes +
             b"\r\n"
         )
@@ -175,9 +243,7 @@ def video_feed():
 @app.route("/snapshot")
 def snapshot():
     """返回当前最新的一帧 JPEG，便于调试"""
-    global latest_frame
-    with frame_lock:
-        frame = None if latest_frame is None else latest_frame.copy()
+    frame, capture_ts, seq = get_latest_frame()
 
     if frame is None:
         return "no frame yet", 503
@@ -186,12 +252,19 @@ def snapshot():
     if not ret:
         return "encode failed", 500
 
-    return Response(jpeg.tobytes(), mimetype="image/jpeg")
+    return Response(
+        jpeg.tobytes(),
+        mimetype="image/jpeg",
+        headers=frame_headers(capture_ts, seq),
+    )
 
 
 def main():
     global stop_flag
 
+    # 信号处理只能在主线程注册，真正的开始/结束由采集线程 poll
+    TRACER.install_signal_handler()
+
     # 启动采集线程
     t = threading.Thread(target=capture_thread_func, daemon=True)
     t.start()
@@ -204,6 +277,8 @@ def main():
         app.run(host=HTTP_HOST, port=HTTP_PORT, debug=False, threaded=True)
     finally:
         stop_flag = True
+        with frame_cond:
+            frame_cond.notify_all()
         t.join(timeout=2)
         print("[INFO] 程序退出")
 
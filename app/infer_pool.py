@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class InferencePool:
+    """
+    帧级并行推理池：把抽样帧分发给 N 个 worker，结果按提交顺序（帧序）取回。
+
+    - mode="thread"：N 个线程，每个线程在 init_fn 里创建自己的会话
+    - mode="process"：N 个进程（spawn 启动，避免 fork 继承原生库状态）
+    - init_fn / work_fn 必须是模块级函数（进程模式下需要可 pickle）
+    """
+
+    def __init__(self, workers, mode, init_fn, work_fn, max_pending=None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"未知的 INFER_POOL_MODE: {mode}")
+
+        self.workers = workers
+        self.mode = mode
+        self.work_fn = work_fn
+        # 在途帧上限：太多只会堆内存、放大延迟
+        self.max_pending = max_pending or workers * 2
+
+        if mode == "thread":
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="infer",
+                initializer=init_fn,
+                initargs=(mode,),
+            )
+        else:
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_fn,
+                initargs=(mode,),
+            )
+
+        # (frame_idx, frame, meta, future)，按提交顺序排列；只由主循环线程读写
+        self.pending = deque()
+
+        print(f"[INFO] 推理池已启动：mode={mode}, workers={workers}, max_pending={self.max_pending}")
+
+    def submit(self, frame_idx, frame, meta=None):
+        """
+        提交一帧。meta 原样随结果返回（不传给 worker），如采集时间戳。
+        在途帧已满时阻塞等待最早的一帧完成，返回期间已完成的有序结果。
+        """
+        ready = []
+        while len(self.pending) >= self.max_pending:
+            _wait(self.pending[0][-1])
+            ready.extend(self.poll())
+
+        future = self.executor.submit(self.work_fn, frame)
+        self.pending.append((frame_idx, frame, meta, future))
+        return ready
+
+    def poll(self):
+        """
+        取回队首连续已完成的帧：[(frame_idx, frame, meta, result), ...]，严格按帧序。
+        result 是 work_fn 的返回值，worker 抛异常时为 None。
+        后面的帧即使先算完，也要等前面的帧完成才会输出。
+        """
+        ready = []
+        while self.pending and self.pending[0][-1].done():
+            frame_idx, frame, meta, future = self.pending.popleft()
+            ready.append((frame_idx, frame, meta, _result_or_none(frame_idx, future)))
+        return ready
+
+    def drain(self):
+        """等待所有在途帧完成，按帧序返回全部结果"""
+        ready = []
+        while self.pending:
+            _wait(self.pending[0][-1])
+            ready.extend(self.poll())
+        return ready
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        print("[INFO] 推理池已关闭")
+
+
+def _wait(future):
+    try:
+        future.exception()
+    except Exception:
+        # 被取消的 future 会抛 CancelledError，交给 poll 统一处理
+        pass
+
+
+def _result_or_none(frame_idx, future):
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"[WARN] 第 {frame_idx} 帧推理失败：", e)
+        return None
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+hik_mjpeg_server 压测工具：并发打开多个 /video_feed 和 /snapshot 客户端，
+统计实际到达帧率、延迟、断线重连次数，以及服务端进程 CPU 占用。
+
+    python -m app.load_gen --base-url http://127.0.0.1:5000 --video-clients 8 \\
+        --snapshot-clients 4 --duration 30 --server-pid $(pgrep -f app.hik_mjpeg_server)
+
+延迟 = 收到帧的时间 - 帧头里的 X-Capture-Timestamp，压测机和服务端需要是同一台机器（或时钟同步）。
+"""
+
+import os
+import time
+import argparse
+import threading
+import urllib.request
+
+from app.mjpeg_reader import MjpegReader
+
+
+class ClientStats:
+    """单个客户端的统计"""
+
+    def __init__(self, kind, idx):
+        self.kind = kind
+        self.idx = idx
+        self.frames = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.latencies = []  # 秒
+        self.active_time = 0.0  # 实际在跑的时长（扣掉启动错开时间）
+
+
+# ================== 客户端 ==================
+
+def video_client(stats, url, start_at, deadline, timeout):
+    """持续读 /video_feed，只计数不解码；断开后自动重连"""
+    time.sleep(max(0.0, start_at - time.time()))
+    began = time.time()
+
+    reader = None
+    # 曾经连上过才算“重连”；连接失败只计入 errors
+    ever_connected = False
+    while time.time() < deadline:
+        if reader is None or not reader.isOpened():
+            reader = MjpegReader(url, timeout=timeout)
+            if not reader.isOpened():
+                stats.errors += 1
+                time.sleep(1.0)
+                continue
+            if ever_connected:
+                stats.reconnects += 1
+            ever_connected = True
+
+        ret, _ = reader.read_raw()
+        if not ret:
+            stats.errors += 1
+            continue
+
+        stats.frames += 1
+        capture_ts = reader.last_meta["capture_ts"]
+        if capture_ts is not None:
+            stats.latencies.append(time.time() - capture_ts)
+
+    if reader is not None:
+        reader.release()
+    stats.active_time = time.time() - began
+
+
+def snapshot_client(stats, url, start_at, deadline, timeout, interval):
+    """按固定间隔请求 /snapshot；有采集时间戳时算帧龄，否则记请求往返时间"""
+    time.sleep(max(0.0, start_at - time.time()))
+    began = time.time()
+
+    while time.time() < deadline:
+        sent = time.time()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resp:
+                resp.read()
+                capture_ts = resp.headers.get("X-Capture-Timestamp")
+            now = time.time()
+            stats.frames += 1
+            stats.latencies.append(now - float(capture_ts) if capture_ts else now - sent)
+        except Exception:
+            stats.errors += 1
+
+        time.sleep(max(0.0, interval - (time.time() - sent)))
+
+    stats.active_time = time.time() - began
+
+
+# ================== 服务端 CPU ==================
+
+def read_proc_cpu_seconds(pid):
+    """读取 /proc/<pid>/stat 里的 utime + stime（秒）；读不到返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # comm 字段可能带空格，从最后一个 ')' 之后开始数：utime/stime 是第 14/15 个字段
+    fields = data[data.rindex(")") + 2:].split()
+    ticks = int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+# ================== 汇总 ==================
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def print_report(kind, all_stats):
+    if not all_stats:
+        return
+
+    fps_list = [s.frames / s.active_time for s in all_stats if s.active_time > 0]
+    latencies = [x for s in all_stats for x in s.latencies]
+    frames = sum(s.frames for s in all_stats)
+    errors = sum(s.errors for s in all_stats)
+    reconnects = sum(s.reconnects for s in all_stats)
+
+    print(f"---- {kind}：{len(all_stats)} 个客户端 ----")
+    print(f"  总帧数={frames}, 错误={errors}, 重连={reconnects}")
+    if fps_list:
+        print(
+            f"  每客户端帧率：avg={sum(fps_list) / len(fps_list):.2f}, "
+            f"min={min(fps_list):.2f}, max={max(fps_list):.2f}, 合计={sum(fps_list):.2f}"
+        )
+    if latencies:
+        print(
+            f"  延迟(ms)：p50={percentile(latencies, 50) * 1000:.0f}, "
+            f"p95={percentile(latencies, 95) * 1000:.0f}, "
+            f"max={max(latencies) * 1000:.0f}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="hik_mjpeg_server 压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--video-clients", type=int, default=4, help="/video_feed 并发数")
+    parser.add_argument("--snapshot-clients", type=int, default=0, help="/snapshot 并发数")
+    parser.add_argument("--snapshot-interval", type=float, default=0.2, help="每个 snapshot 客户端的请求间隔（秒）")
+    parser.add_argument("--duration", type=float, default=30.0, help="压测时长（秒）")
+    parser.add_argument("--ramp", type=float, default=0.0, help="客户端在多少秒内错开启动，0=同时启动")
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--server-pid", type=int, default=0, help="服务端进程 PID，用于统计 CPU 占用")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    base = args.base_url.rstrip("/")
+
+    start = time.time()
+    deadline = start + args.ramp + args.duration
+    total = args.video_clients + args.snapshot_clients
+
+    video_stats = [ClientStats("video_feed", i) for i in range(args.video_clients)]
+    snapshot_stats = [ClientStats("snapshot", i) for i in range(args.snapshot_clients)]
+
+    threads = []
+    for n, stats in enumerate(video_stats + snapshot_stats):
+        start_at = start + (args.ramp * n / total if total else 0.0)
+        if stats.kind == "video_feed":
+            target = video_client
+            fn_args = (stats, f"{base}/video_feed", start_at, deadline, args.timeout)
+        else:
+            target = snapshot_client
+            fn_args = (stats, f"{base}/snapshot", start_at, deadline, args.timeout, args.snapshot_interval)
+        t = threading.Thread(target=target, args=fn_args, daemon=True)
+        t.start()
+        threads.append(t)
+
+    print(f"[INFO] 压测开始：{base}，video={args.video_clients}，snapshot={args.snapshot_clients}，"
+          f"时长={args.duration}s（错开启动 {args.ramp}s）")
+
+    cpu_start = read_proc_cpu_seconds(args.server_pid) if args.server_pid else None
+    wall_start = time.time()
+
+    for t in threads:
+        t.join(timeout=max(0.0, deadline - time.time()) + args.timeout + 1)
+
+    print("==================================================")
+    print_report("/video_feed", video_stats)
+    print_report("/snapshot", snapshot_stats)
+
+    if args.server_pid:
+        cpu_end = read_proc_cpu_seconds(args.server_pid)
+        if cpu_start is None or cpu_end is None:
+            print(f"[WARN] 无法读取服务端进程 {args.server_pid} 的 CPU 数据")
+        else:
+            cpu_pct = (cpu_end - cpu_start) / (time.time() - wall_start) * 100
+            print(f"---- 服务端 CPU（pid={args.server_pid}）：{cpu_pct:.1f}%（单核=100%）----")
+    print("==================================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+
+
+class MjpegReader:
+    """
+    原生 multipart/x-mixed-replace 读取器，用法与 cv2.VideoCapture 保持一致（isOpened / read / release）。
+    相比 VideoCapture，它能拿到 hik_mjpeg_server 在每个 part 里附带的头：
+    - X-Capture-Timestamp：摄像头帧被读出的时间（epoch 秒）
+    - X-Frame-Seq：服务端帧序号
+    每次 read() 成功后，对应信息放在 last_meta = {"capture_ts", "seq"}。
+
+    max_age > 0 时，采集时间早于 now - max_age 的帧直接丢弃（不解码），计入 stale_skipped
+    （调用方可以定期取走并清零，比如 face_runtime 把它累加进全局统计）。
+    连续丢弃 max_stale_skips 帧后不再丢，直接返回最新这一帧并（限频）告警：
+    两端时钟不同步或第三方源的时间戳不可信时，所有帧都会“过期”，不能因此让流整个哑掉。
+    """
+
+    # 连续丢帧告警的最小间隔（秒）
+    STALE_WARN_INTERVAL = 30.0
+
+    def __init__(self, url, timeout=5.0, max_age=0.0, max_stale_skips=50):
+        self.url = url
+        self.max_age = max_age
+        self.max_stale_skips = max_stale_skips
+        self.last_meta = None
+        self.stale_skipped = 0
+        self.last_stale_warn = 0.0
+        self.stream = None
+        self.boundary = None
+        # 无 Content-Length 时读正文会顺带吃掉下一个边界行，记下来供下次 _read_part 跳过
+        self.boundary_consumed = False
+
+        try:
+            self.stream = urllib.request.urlopen(url, timeout=timeout)
+        except Exception as e:
+            print("[WARN] MJPEG 流连接失败：", e)
+            return
+
+        content_type = self.stream.headers.get("Content-Type", "")
+        self.boundary = _parse_boundary(content_type)
+        if self.boundary is None:
+            print("[WARN] 不是 multipart 流：", content_type)
+            self.release()
+
+    def isOpened(self):
+        return self.stream is not None
+
+    def release(self):
+        if self.stream is not None:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+        self.stream = None
+
+    def read(self):
+        """读取下一帧，返回 (ret, frame)；网络异常时关闭连接，由调用方重连"""
+        ret, data = self.read_raw()
+        if not ret:
+            return False, None
+
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return False, None
+        return True, frame
+
+    def read_raw(self):
+        """读取下一帧但不解码，返回 (ret, jpeg_bytes)；压测客户端只计数不解码"""
+        if self.stream is None:
+            return False, None
+
+        try:
+            skipped = 0
+            while True:
+                headers, data = self._read_part()
+                if data is None:
+                    self.release()
+                    return False, None
+
+                meta = _parse_meta(headers)
+                if self.max_age > 0 and meta["capture_ts"] is not None:
+                    age = time.time() - meta["capture_ts"]
+                    if age > self.max_age:
+                        if skipped < self.max_stale_skips:
+                            skipped += 1
+                            self.stale_skipped += 1
+                            continue
+                        self._warn_stale(age, skipped)
+
+                self.last_meta = meta
+                return True, data
+        except Exception as e:
+            print("[WARN] 读取 MJPEG 流异常：", e)
+            self.release()
+            return False, None
+
+    def _warn_stale(self, age, skipped):
+        now = time.time()
+        if now - self.last_stale_warn < self.STALE_WARN_INTERVAL:
+            return
+        self.last_stale_warn = now
+        print(
+            f"[WARN] 连续 {skipped} 帧超过 {self.max_age}s 被丢弃（当前帧龄 {age:.1f}s），"
+            f"改为直接使用最新帧；请检查两端时钟是否同步 / MAX_FRAME_AGE 是否过小"
+        )
+
+    def _read_part(self):
+        """读一个 part：跳到边界行，读头，再按 Content-Length（或下一个边界）读正文"""
+        delimiter = b"--" + self.boundary
+
+        # 1) 跳过上一个 part 正文后的空行，直到边界行
+        while not self.boundary_consumed:
+            line = self.stream.readline()
+            if not line:
+                return None, None
+            if line.strip().startswith(delimiter):
+                break
+        self.boundary_consumed = False
+
+        # 2) part 头，空行结束
+        headers = {}
+        while True:
+            line = self.stream.readline()
+            if not line:
+                return None, None
+            line = line.strip()
+            if not line:
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        # 3) 正文
+        length = headers.get("content-length")
+        if length is not None:
+            data = self.stream.read(int(length))
+            if len(data) < int(length):
+                return None, None
+            return headers, data
+
+        # 没有 Content-Length 的流（比如别的 MJPEG 源）：一直读到下一个边界
+        chunks = []
+        while True:
+            line = self.stream.readline()
+            if not line:
+                return None, None
+            if line.strip().startswith(delimiter):
+                self.boundary_consumed = True
+                break
+            chunks.append(line)
+        return headers, b"".join(chunks).rstrip(b"\r\n")
+
+
+def _parse_boundary(content_type):
+    if not content_type.lower().startswith("multipart/"):
+        return None
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary":
+            value = value.strip('"')
+            # 有的服务端会把 "--" 写进 boundary 参数里
+            if value.startswith("--"):
+                value = value[2:]
+            return value.encode("latin-1")
+    return None
+
+
+def _parse_meta(headers):
+    capture_ts = headers.get("x-capture-timestamp")
+    seq = headers.get("x-frame-seq")
+    try:
+        capture_ts = float(capture_ts) if capture_ts is not None else None
+    except ValueError:
+        capture_ts = None
+    try:
+        seq = int(seq) if seq is not None else None
+    except ValueError:
+        seq = None
+    return {"capture_ts": capture_ts, "seq": seq}
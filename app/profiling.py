@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import signal
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+from app.config import (
+    PROFILE_DIR,
+    PROFILE_ON_START,
+    PROFILE_FRAMES,
+    PROFILE_SECONDS,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL,
+)
+
+
+class FrameTracer:
+    """
+    逐帧 trace 采集器，常驻编译在代码里，平时关闭：
+    - 关闭时调用方只需检查 tracer.active（一个属性读），record() 也会立即返回
+    - SIGUSR1 只设置一个标志，真正的开始/结束由调用方循环里的 poll() 完成
+      （信号处理函数里不碰锁和文件，避免和正在写 trace 的线程死锁；
+      cProfile 也因此总在同一个线程里开关）
+    - 一次采集写 {PROFILE_DIR}/{service}-{时间}.jsonl，记满 PROFILE_FRAMES 条或 PROFILE_SECONDS 秒自动结束
+    - PROFILE_MODE=cprofile：只对调用 poll() 的线程做 cProfile，结束时写 .prof
+    - PROFILE_MODE=stack：后台线程定时采样本进程所有线程的调用栈，结束时写 .stacks.txt（flamegraph collapsed 格式）
+    主要耗时不在覆盖范围内时（推理池、Flask 请求线程、子进程），调用方传 cprofile_warning / stack_warning，
+    开始采集时原样打印。
+    """
+
+    def __init__(self, service, cprofile_warning=None, stack_warning=None):
+        self.service = service
+        self.cprofile_warning = cprofile_warning
+        self.stack_warning = stack_warning
+        self.active = False
+        self.toggle_requested = PROFILE_ON_START
+        # record() 记满后只停写并置位，收尾（关文件、写 .prof）留给 poll()
+        self.stop_requested = False
+        self.lock = threading.Lock()
+
+        self.file = None
+        self.base_path = None
+        self.remaining = 0
+        self.deadline = 0.0
+
+        self.profiler = None
+        self.sampler = None
+        self.sampler_stop = threading.Event()
+        self.stack_counts = Counter()
+
+    # ---------- 触发 ----------
+
+    def install_signal_handler(self):
+        """注册 SIGUSR1（只能在主线程调用）"""
+        signal.signal(signal.SIGUSR1, self._on_signal)
+        print(f"[INFO] 性能剖析就绪：kill -USR1 {os.getpid()} 开始/结束一次采集，输出到 {PROFILE_DIR}")
+
+    def _on_signal(self, signum, frame):
+        self.toggle_requested = True
+
+    def poll(self):
+        """在主循环里每轮调用；关闭且没有待处理的触发时只是几次属性读"""
+        if self.active and time.time() >= self.deadline:
+            self.stop_requested = True
+        if not (self.toggle_requested or self.stop_requested):
+            return
+        if self.stop_requested:
+            self.stop_requested = False
+            self.stop("达到帧数/时长上限")
+        if self.toggle_requested:
+            self.toggle_requested = False
+            if self.file is not None:
+                self.stop("收到信号")
+            else:
+                self.start()
+
+    # ---------- 开始 / 结束 ----------
+
+    def start(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+
+        with self.lock:
+            if self.file is not None:
+                return
+            base_path, self.file = _open_new_trace(self.service)
+            self.base_path = base_path
+            self.remaining = PROFILE_FRAMES
+            self.deadline = time.time() + PROFILE_SECONDS
+            self.active = True
+
+        if PROFILE_MODE == "cprofile":
+            if self.cprofile_warning:
+                print(f"[WARN] PROFILE_MODE=cprofile 只覆盖当前线程：{self.cprofile_warning}")
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif PROFILE_MODE == "stack":
+            if self.stack_warning:
+                print(f"[WARN] PROFILE_MODE=stack 只覆盖本进程的线程：{self.stack_warning}")
+            self.stack_counts = Counter()
+            self.sampler_stop.clear()
+            self.sampler = threading.Thread(target=self._sample_stacks, name="stack-sampler", daemon=True)
+            self.sampler.start()
+
+        print(f"[INFO] 性能剖析开始：最多 {PROFILE_FRAMES} 帧 / {PROFILE_SECONDS} 秒 -> {base_path}.jsonl")
+
+    def stop(self, reason):
+        with self.lock:
+            if self.file is None:
+                return
+            self.active = False
+            self.file.close()
+            self.file = None
+            base_path = self.base_path
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(base_path + ".prof")
+            self.profiler = None
+
+        if self.sampler is not None:
+            self.sampler_stop.set()
+            self.sampler.join(timeout=2)
+            self.sampler = None
+            with open(base_path + ".stacks.txt", "w", encoding="utf-8") as f:
+                for stack, count in self.stack_counts.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        print(f"[INFO] 性能剖析结束（{reason}）：{base_path}.*")
+
+    # ---------- 记录 ----------
+
+    def record(self, kind, **fields):
+        """写一条 trace；未开启时直接返回。毫秒字段由调用方算好"""
+        if not self.active:
+            return
+
+        fields["ts"] = round(time.time(), 6)
+        fields["kind"] = kind
+        line = json.dumps(fields, ensure_ascii=False)
+
+        with self.lock:
+            if not self.active:
+                return
+            self.file.write(line + "\n")
+            self.remaining -= 1
+            if self.remaining <= 0 or time.time() >= self.deadline:
+                self.active = False
+                self.stop_requested = True
+
+    # ---------- 栈采样 ----------
+
+    def _sample_stacks(self):
+        me = threading.get_ident()
+        while not self.sampler_stop.wait(PROFILE_SAMPLE_INTERVAL):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stack_counts[";".join(reversed(stack))] += 1
+
+
+def _open_new_trace(service):
+    """
+    新建本次采集的 .jsonl（毫秒级时间戳 + 独占创建），返回 (base_path, file)。
+    同一毫秒撞名时加序号，绝不覆盖之前的 .jsonl / .prof / .stacks.txt。
+    """
+    now = datetime.now()
+    stamp = now.strftime("%Y%m%d_%H%M%S_") + f"{now.microsecond // 1000:03d}"
+    base_path = os.path.join(PROFILE_DIR, f"{service}-{stamp}")
+    suffix = 0
+    while True:
+        path = base_path if suffix == 0 else f"{base_path}-{suffix}"
+        try:
+            return path, open(path + ".jsonl", "x", encoding="utf-8")
+        except FileExistsError:
+            suffix += 1
+
+
+def ms(seconds):
+    """秒 -> 毫秒，保留 3 位小数，trace 里统一用毫秒"""
+    return round(seconds * 1000, 3)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+
+class UnknownCluster:
+    """一个陌生人簇：归一化的中心特征 + 统计信息"""
+
+    def __init__(self, cluster_no, feature, now, run_id):
+        self.cluster_no = cluster_no
+        self.label = f"unknown-{run_id}-{cluster_no}"
+        self.centroid = feature
+        self.count = 1
+        self.first_seen = now
+        self.last_seen = now
+        # 上次写日志的时间（None 表示还没记录过）
+        self.last_logged = None
+        # 代表性截图路径（相对 DATA_ROOT），没保存则为空串
+        self.image_path = ""
+
+
+class UnknownClusterIndex:
+    """
+    陌生人特征的有界在线聚类（只在内存里）：
+    - 伪标签为 unknown-<run_id>-<n>，run_id 默认是进程启动时间（精确到秒），
+      容器重启后簇编号从 1 重来，但标签不会和之前 CSV 里的行撞车
+    - 新特征与所有簇中心比余弦相似度，最高的 >= threshold 就归入该簇并更新中心
+    - 否则新开一个簇，编号单调递增，不会复用
+    - 超过 max_clusters 时淘汰最久未出现的簇（OrderedDict 维护 LRU 顺序）
+    """
+
+    def __init__(self, threshold, max_clusters, run_id=None):
+        self.threshold = threshold
+        self.max_clusters = max_clusters
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d%H%M%S")
+        self.clusters = OrderedDict()  # cluster_no -> UnknownCluster
+        self.next_no = 1
+
+    def assign(self, feature, now=None):
+        """
+        把一个陌生人特征归入簇，返回 (cluster, is_new)。
+        """
+        now = time.time() if now is None else now
+        feature = _normalize(feature)
+
+        best = None
+        best_sim = -1.0
+        for cluster in self.clusters.values():
+            sim = float(np.dot(cluster.centroid, feature))
+            if sim > best_sim:
+                best, best_sim = cluster, sim
+
+        if best is not None and best_sim >= self.threshold:
+            # 增量更新中心：running mean 后重新归一化
+            best.centroid = _normalize(best.centroid * best.count + feature)
+            best.count += 1
+            best.last_seen = now
+            self.clusters.move_to_end(best.cluster_no)
+            return best, False
+
+        cluster = UnknownCluster(self.next_no, feature, now, self.run_id)
+        self.next_no += 1
+        self.clusters[cluster.cluster_no] = cluster
+
+        while len(self.clusters) > self.max_clusters:
+            self.clusters.popitem(last=False)
+
+        return cluster, True
+
+    def should_log(self, cluster, interval, now=None):
+        """同一个簇在 interval 秒内只记录一次，命中时顺便更新 last_logged"""
+        now = time.time() if now is None else now
+        if cluster.last_logged is not None and now - cluster.last_logged < interval:
+            return False
+        cluster.last_logged = now
+        return True
+
+
+def _normalize(feature):
+    feature = np.asarray(feature, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(feature))
+    if norm == 0.0:
+        return feature
+    return feature / norm